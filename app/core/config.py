@@ -17,6 +17,11 @@ class Settings(BaseSettings):
     # Azure Document Intelligence Settings
     AZURE_DOC_INTELLIGENCE_ENDPOINT: Optional[str] = None
     AZURE_DOC_INTELLIGENCE_KEY: Optional[str] = None
+    DOC_INTELLIGENCE_PAGE_RANGE_SIZE: int = 0  # Pages per concurrently analyzed range, 0 analyzes in one call
+    DOC_INTELLIGENCE_MAX_CONCURRENCY: int = 4  # Page ranges analyzed at the same time
+    DOC_INTELLIGENCE_RANGE_RETRIES: int = 3  # Attempts per page range
+    DOC_INTELLIGENCE_RETRY_WAIT: float = 1.0  # Base delay in seconds between attempts (exponential)
+    DOC_INTELLIGENCE_CACHE_SIZE: int = 256  # Page range results kept in memory
     
     # Pandoc Settings
     PANDOC_PATH: str = "pandoc"  # Assumes pandoc is in PATH
@@ -25,6 +30,13 @@ class Settings(BaseSettings):
     # Comparison Settings
     SIMILARITY_THRESHOLD: float = 0.3  # Below this, documents are considered unrelated
     MAX_DIFF_SIZE: int = 1000000  # Maximum size of diff to process
+    DIFF_HUNK_LINES: int = 500  # Lines per hunk when streaming a diff
+    
+    # Normalization Settings
+    NORMALIZE_TEXT: bool = True  # Strip layout noise before diffing
+    NORMALIZE_FURNITURE_MIN_RATIO: float = 0.5  # Share of pages a header/footer line must repeat on
+    NORMALIZE_FURNITURE_EDGE_LINES: int = 3  # Lines at the top/bottom of each page checked for headers/footers
+    NORMALIZE_JOIN_HYPHENATION: bool = False  # Join "word-\nbreak" line breaks (also merges real compounds)
     
     # API Settings
     MAX_UPLOAD_SIZE: int = 40 * 1024 * 1024  # 40MB
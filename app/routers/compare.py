@@ -1,14 +1,15 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 import aiohttp
 from urllib.parse import urlparse
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.core.config import settings
-from app.services.conversion import convert_to_text
-from app.services.diffing import compute_diff
+from app.services.conversion import analyze_document
+from app.services.diffing import DiffStream, compute_diff, stream_diff
+from app.services.normalization import NormalizedText, normalize_text
 from app.services.llm_changelog import generate_changelog
 import tempfile
 import os
-from typing import List
+from typing import Iterator, List, Tuple
 
 router = APIRouter()
 
@@ -26,6 +27,55 @@ async def download_file(url: str) -> bytes:
                 raise HTTPException(status_code=400, detail="Failed to download file")
             return await response.read()
 
+async def load_texts(
+    source: UploadFile | None,
+    target: UploadFile | None,
+    source_url: str | None,
+    target_url: str | None
+) -> Tuple[NormalizedText, NormalizedText]:
+    """Fetch both documents and convert them to text, normalized when enabled"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as source_tmp, \
+         tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as target_tmp:
+        
+        # Handle source document
+        if source:
+            source_content = await source.read()
+        elif source_url:
+            source_content = await download_file(source_url)
+        else:
+            raise HTTPException(status_code=400, detail="No source document provided")
+
+        # Handle target document
+        if target:
+            target_content = await target.read()
+        elif target_url:
+            target_content = await download_file(target_url)
+        else:
+            raise HTTPException(status_code=400, detail="No target document provided")
+
+        # Write content to temp files
+        source_tmp.write(source_content)
+        target_tmp.write(target_content)
+        
+        try:
+            # Convert to text
+            source_doc = analyze_document(source_tmp.name)
+            target_doc = analyze_document(target_tmp.name)
+            
+            # Strip layout noise (page furniture, whitespace, quotes, dashes)
+            if settings.NORMALIZE_TEXT:
+                return (
+                    normalize_text(source_doc.content, source_doc.page_offsets),
+                    normalize_text(target_doc.content, target_doc.page_offsets)
+                )
+
+            return NormalizedText.unchanged(source_doc.content), NormalizedText.unchanged(target_doc.content)
+            
+        finally:
+            # Cleanup temporary files
+            os.unlink(source_tmp.name)
+            os.unlink(target_tmp.name)
+
 @router.post("/upload")
 async def upload_documents(
     source: UploadFile | None = None,
@@ -35,54 +85,46 @@ async def upload_documents(
 ):
     """Upload or provide URLs for two documents to compare"""
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as source_tmp, \
-             tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as target_tmp:
-            
-            # Handle source document
-            if source:
-                source_content = await source.read()
-            elif source_url:
-                source_content = await download_file(source_url)
-            else:
-                raise HTTPException(status_code=400, detail="No source document provided")
+        source_text, target_text = await load_texts(source, target, source_url, target_url)
+        
+        # Compute diff
+        diff_result = compute_diff(source_text.text, target_text.text)
+        
+        # Generate changelog using LLM
+        if diff_result["similarity_score"] >= settings.SIMILARITY_THRESHOLD:
+            changelog = await generate_changelog(diff_result["diff_text"])
+        else:
+            changelog = {"warning": "Documents appear to be unrelated"}
 
-            # Handle target document
-            if target:
-                target_content = await target.read()
-            elif target_url:
-                target_content = await download_file(target_url)
-            else:
-                raise HTTPException(status_code=400, detail="No target document provided")
+        return {
+            "diff_text": diff_result["diff_text"],
+            "similarity_score": diff_result["similarity_score"],
+            "changelog": changelog,
+            "warning": diff_result["similarity_score"] < settings.SIMILARITY_THRESHOLD
+        }
 
-            # Write content to temp files
-            source_tmp.write(source_content)
-            target_tmp.write(target_content)
-            
-            try:
-                # Convert to text
-                source_text = convert_to_text(source_tmp.name)
-                target_text = convert_to_text(target_tmp.name)
-                
-                # Compute diff
-                diff_result = compute_diff(source_text, target_text)
-                
-                # Generate changelog using LLM
-                if diff_result["similarity_score"] >= settings.SIMILARITY_THRESHOLD:
-                    changelog = await generate_changelog(diff_result["diff_text"])
-                else:
-                    changelog = {"warning": "Documents appear to be unrelated"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def with_similarity_trailer(stream: DiffStream) -> Iterator[str]:
+    """Yield the diff hunks followed by a trailing similarity score line"""
+    yield from stream
+    yield f"\n# similarity_score: {stream.similarity_score}\n"
 
-                return {
-                    "diff_text": diff_result["diff_text"],
-                    "similarity_score": diff_result["similarity_score"],
-                    "changelog": changelog,
-                    "warning": diff_result["similarity_score"] < settings.SIMILARITY_THRESHOLD
-                }
-                
-            finally:
-                # Cleanup temporary files
-                os.unlink(source_tmp.name)
-                os.unlink(target_tmp.name)
+@router.post("/diff")
+async def stream_document_diff(
+    source: UploadFile | None = None,
+    target: UploadFile | None = None,
+    source_url: str | None = Form(None),
+    target_url: str | None = Form(None)
+):
+    """Stream the unified diff of two documents hunk by hunk, ending with the similarity score"""
+    try:
+        source_text, target_text = await load_texts(source, target, source_url, target_url)
+        return StreamingResponse(
+            with_similarity_trailer(stream_diff(source_text.text, target_text.text)),
+            media_type="text/plain"
+        )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
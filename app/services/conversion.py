@@ -1,19 +1,51 @@
 import os
-from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
 from fastapi import HTTPException
 from azure.ai.documentintelligence import DocumentIntelligenceClient
 from azure.ai.documentintelligence.models import AnalyzeDocumentRequest, AnalyzeResult
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
 from app.core.config import settings
 import logging
 import base64
+import hashlib
+import re
+import threading
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class ConvertedDocument:
+    """Extracted document text with the start offset of each page in it"""
+    content: str
+    page_offsets: List[int] = field(default_factory=list)
+
+# LRU cache of analyzed page ranges keyed by (file digest, page range);
+# None records a range the service rejected as beyond the last page
+_range_cache: "OrderedDict[Tuple[str, str], Optional[ConvertedDocument]]" = OrderedDict()
+_range_cache_lock = threading.Lock()
+
+# Out-of-range page requests are rejected with an InvalidParameter error on `pages`
+_PAGE_RANGE_ERROR_CODE = "InvalidParameter"
+_PAGES_PARAMETER_RE = re.compile(r"\bparameter\s+'?pages'?\b", re.IGNORECASE)
+
 def convert_to_text(docx_path: str) -> str:
     """
     Convert DOCX to plain text using Azure Document Intelligence
     """
+    return analyze_document(docx_path).content
+
+def analyze_document(docx_path: str) -> ConvertedDocument:
+    """
+    Analyze a document using Azure Document Intelligence, keeping page offsets.
+
+    When DOC_INTELLIGENCE_PAGE_RANGE_SIZE is set, the document is analyzed in
+    page ranges concurrently and the results are stitched back together.
+    """
     # Check credentials
     endpoint = settings.AZURE_DOC_INTELLIGENCE_ENDPOINT
     key = settings.AZURE_DOC_INTELLIGENCE_KEY
@@ -34,25 +66,169 @@ def convert_to_text(docx_path: str) -> str:
         with open(docx_path, "rb") as f:
             file_bytes = f.read()
 
-        # Create analyze request with bytes source
-        analyze_request = AnalyzeDocumentRequest(
-            bytes_source=file_bytes  # Changed from base64_source to bytes_source
-        )
+        range_size = settings.DOC_INTELLIGENCE_PAGE_RANGE_SIZE
+        if range_size > 0:
+            return _analyze_page_ranges(document_intelligence_client, file_bytes, range_size)
 
-        # Start analysis
-        poller = document_intelligence_client.begin_analyze_document(
-            "prebuilt-layout",
-            analyze_request
-        )
-        
-        result: AnalyzeResult = poller.result()
-
-        return result.content
+        result = _analyze(document_intelligence_client, file_bytes)
+        return ConvertedDocument(result.content, _page_offsets(result))
 
     except Exception as e:
         logger.error(f"Azure Document Intelligence conversion failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def clear_analysis_cache():
+    """Drop all cached page range results"""
+    with _range_cache_lock:
+        _range_cache.clear()
+
+def _analyze(client: DocumentIntelligenceClient, file_bytes: bytes, pages: Optional[str] = None) -> AnalyzeResult:
+    """Run the prebuilt layout model on the whole document or the given page range"""
+    # Create analyze request with bytes source
+    analyze_request = AnalyzeDocumentRequest(
+        bytes_source=file_bytes  # Changed from base64_source to bytes_source
+    )
+
+    # Start analysis
+    options = {"pages": pages} if pages else {}
+    poller = client.begin_analyze_document(
+        "prebuilt-layout",
+        analyze_request,
+        **options
+    )
+    
+    return poller.result()
+
+def _analyze_page_ranges(client: DocumentIntelligenceClient, file_bytes: bytes, range_size: int) -> ConvertedDocument:
+    """
+    Analyze consecutive page ranges concurrently and stitch them in page order.
+
+    The page count is not known up front, so ranges are requested in waves of
+    DOC_INTELLIGENCE_MAX_CONCURRENCY until one comes back short or the service
+    rejects it as beyond the last page. A rejection is only accepted when the
+    page right after the rejected range is rejected too, and later ranges in
+    the wave must not return pages; otherwise pages would be silently dropped.
+    """
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    fan_out = max(1, settings.DOC_INTELLIGENCE_MAX_CONCURRENCY)
+    parts: List[ConvertedDocument] = []
+    first_page = 1
+    end_reached = False
+
+    with ThreadPoolExecutor(max_workers=fan_out) as executor:
+        while not end_reached:
+            wave = [
+                f"{start}-{start + range_size - 1}"
+                for start in range(first_page, first_page + fan_out * range_size, range_size)
+            ]
+            results = list(executor.map(
+                lambda pages: _analyze_range(client, file_bytes, digest, pages),
+                wave
+            ))
+            for pages, result in zip(wave, results):
+                if end_reached:
+                    if result is not None and result.page_offsets:
+                        raise ConversionError(f"Page range {pages} returned pages after the end of the document")
+                elif result is None:
+                    if not parts:
+                        raise ConversionError(f"Page range {pages} was rejected as out of range")
+                    _confirm_end(client, file_bytes, digest, pages)
+                    end_reached = True
+                else:
+                    if result.page_offsets:
+                        parts.append(result)
+                    end_reached = len(result.page_offsets) < range_size
+            first_page += fan_out * range_size
+
+    logger.debug(f"Analyzed {len(parts)} page ranges of {range_size} pages")
+    return _stitch(parts)
+
+def _analyze_range(client: DocumentIntelligenceClient, file_bytes: bytes, digest: str, pages: str) -> Optional[ConvertedDocument]:
+    """
+    Analyze a single page range with retries, using the range cache.
+
+    Returns None when the service rejects the range as beyond the last page.
+    """
+    key = (digest, pages)
+    with _range_cache_lock:
+        if key in _range_cache:
+            _range_cache.move_to_end(key)
+            return _range_cache[key]
+
+    try:
+        for attempt in Retrying(
+            stop=stop_after_attempt(max(1, settings.DOC_INTELLIGENCE_RANGE_RETRIES)),
+            wait=wait_exponential(multiplier=settings.DOC_INTELLIGENCE_RETRY_WAIT),
+            retry=retry_if_exception(_is_retryable),
+            reraise=True
+        ):
+            with attempt:
+                result = _analyze(client, file_bytes, pages)
+    except HttpResponseError as e:
+        if not _is_page_range_error(e):
+            raise
+        logger.debug(f"Page range {pages} rejected as out of range: {str(e)}")
+        converted = None
+    else:
+        converted = ConvertedDocument(result.content or "", _page_offsets(result))
+
+    with _range_cache_lock:
+        _range_cache[key] = converted
+        while len(_range_cache) > settings.DOC_INTELLIGENCE_CACHE_SIZE:
+            _range_cache.popitem(last=False)
+    return converted
+
+def _confirm_end(client: DocumentIntelligenceClient, file_bytes: bytes, digest: str, pages: str):
+    """Check that the page after a rejected range is rejected too, so no pages are skipped"""
+    next_page = int(pages.split("-")[1]) + 1
+    probe = _analyze_range(client, file_bytes, digest, f"{next_page}-{next_page}")
+    if probe is not None and probe.page_offsets:
+        raise ConversionError(f"Page range {pages} was rejected but page {next_page} exists")
+
+def _is_page_range_error(error: HttpResponseError) -> bool:
+    """Whether the service rejected the request because of an invalid pages parameter"""
+    if error.status_code != 400 or error.error is None:
+        return False
+
+    # Use the innermost error, which names the offending parameter
+    code, message, target = error.error.code, error.error.message, error.error.target
+    inner = error.error.innererror
+    while isinstance(inner, dict):
+        code, message, target = inner.get("code"), inner.get("message"), inner.get("target", target)
+        inner = inner.get("innererror")
+
+    if code != _PAGE_RANGE_ERROR_CODE:
+        return False
+    return target == "pages" or bool(_PAGES_PARAMETER_RE.search(message or ""))
+
+def _is_retryable(error: BaseException) -> bool:
+    """Retry transient failures: connection problems, timeouts, throttling and server errors"""
+    if isinstance(error, HttpResponseError):
+        return error.status_code is not None and (error.status_code == 429 or error.status_code >= 500)
+    return isinstance(error, (ServiceRequestError, ServiceResponseError, TimeoutError))
+
+def _page_offsets(result: AnalyzeResult) -> List[int]:
+    """Start offset of each analyzed page within the result content"""
+    offsets: List[int] = []
+    for page in result.pages or []:
+        # Pages without spans (e.g. blank pages) start where the previous page did
+        offsets.append(page.spans[0].offset if page.spans else (offsets[-1] if offsets else 0))
+    return offsets
+
+def _stitch(parts: List[ConvertedDocument]) -> ConvertedDocument:
+    """Join page range results in order, shifting page offsets into the joined content"""
+    contents: List[str] = []
+    page_offsets: List[int] = []
+    length = 0
+    for part in parts:
+        if contents:
+            contents.append("\n")
+            length += 1
+        contents.append(part.content)
+        page_offsets.extend(length + offset for offset in part.page_offsets)
+        length += len(part.content)
+    return ConvertedDocument("".join(contents), page_offsets)
+
 def cleanup_temp_files():
     """Clean up temporary files in the TEMP_DIR"""
     try:
@@ -1,68 +1,110 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import logging
+import re
 from diff_match_patch import diff_match_patch
+from app.core.config import settings
 import datetime
 
 logger = logging.getLogger(__name__)
 
-def compute_diff(text1: str, text2: str) -> Dict[str, Any]:
-    """Compute differences between two text documents and return a git-like unified diff format"""
+_LINE_PREFIXES = {-1: "-", 1: "+", 0: " "}
+# Line boundaries recognized by str.splitlines
+_LINE_BREAK_RE = re.compile(r"\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+class DiffStream:
+    """
+    Git-like unified diff emitted incrementally in hunks.
+
+    Iterating yields the header followed by hunks of at most `hunk_lines`
+    lines, so it can feed a StreamingResponse or a file directly. The
+    similarity score is accumulated in the same pass and is available once
+    the stream has been exhausted.
+    """
+
+    def __init__(self, diffs: List[Tuple[int, str]], line_count1: int, line_count2: int, hunk_lines: int):
+        self._diffs = diffs
+        self._line_count1 = line_count1
+        self._line_count2 = line_count2
+        self._hunk_lines = max(1, hunk_lines)
+        self._unchanged_chars = 0
+        self._total_chars = 0
+        self._finished = False
+
+    @property
+    def similarity_score(self) -> Optional[float]:
+        """Similarity score of the whole diff, or None until the stream has been exhausted"""
+        if not self._finished:
+            return None
+        if self._total_chars == 0:
+            return 1.0
+        return self._unchanged_chars / self._total_chars
+
+    def __iter__(self) -> Iterator[str]:
+        self._unchanged_chars = 0
+        self._total_chars = 0
+        self._finished = False
+
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+        yield "\n".join([
+            "--- source",
+            "+++ target",
+            f"@@ -1,{self._line_count1} +1,{self._line_count2} @@ {now}"
+        ])
+
+        hunk: List[str] = []
+        for op, text in self._diffs:
+            self._total_chars += len(text)
+            if op == 0:
+                self._unchanged_chars += len(text)
+
+            prefix = _LINE_PREFIXES[op]
+            for line in text.splitlines():
+                if not line:
+                    continue
+                hunk.append(f"{prefix}{line}")
+                if len(hunk) >= self._hunk_lines:
+                    yield "\n" + "\n".join(hunk)
+                    hunk = []
+
+        if hunk:
+            yield "\n" + "\n".join(hunk)
+
+        self._finished = True
+
+def stream_diff(text1: str, text2: str, hunk_lines: Optional[int] = None) -> DiffStream:
+    """Compute differences between two text documents as a streamed git-like unified diff"""
     try:
         dmp = diff_match_patch()
         dmp.Diff_Timeout = 5.0
-        
-        # Split texts into lines
-        lines1 = text1.splitlines()
-        lines2 = text2.splitlines()
-        
+
         # Compute diffs
         diffs = dmp.diff_main(text1, text2)
         dmp.diff_cleanupSemantic(diffs)
-        
-        # Convert to unified diff format
-        diff_text = _create_unified_diff(lines1, lines2, diffs)
-        
-        # Calculate similarity score
-        similarity = _calculate_similarity(diffs)
-        
-        return {
-            "diff_text": diff_text,
-            "similarity_score": similarity
-        }
-        
+
+        return DiffStream(
+            diffs,
+            _count_lines(text1),
+            _count_lines(text2),
+            hunk_lines or settings.DIFF_HUNK_LINES
+        )
+
     except Exception as e:
         logger.error(f"Error computing differences: {str(e)}")
         raise
 
-def _create_unified_diff(lines1: List[str], lines2: List[str], diffs: List[Tuple[int, str]]) -> str:
-    """Create a unified diff format similar to Git"""
-    # Create diff header
-    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-    header = [
-        "--- source",
-        "+++ target",
-        f"@@ -1,{len(lines1)} +1,{len(lines2)} @@ {now}"
-    ]
-    
-    # Process diffs into unified format
-    unified_diff = []
-    for op, text in diffs:
-        # Split text into lines and process each line
-        for line in text.splitlines():
-            if not line:
-                continue
-            if op == -1:  # Deletion
-                unified_diff.append(f"-{line}")
-            elif op == 1:  # Addition
-                unified_diff.append(f"+{line}")
-            else:  # Context
-                unified_diff.append(f" {line}")
-    
-    # Combine header and diff content
-    return "\n".join(header + unified_diff)
-
-def _calculate_similarity(diffs: List[Tuple[int, str]]) -> float:
-    """Calculate similarity score based on diffs"""
-    unchanged_chars = sum(len(text) for op, text in diffs if op == 0)
-    total_chars = sum(len(text) for _, text in diffs)
-    return unchanged_chars / total_chars if total_chars > 0 else 1.0
\ No newline at end of file
+def compute_diff(text1: str, text2: str) -> Dict[str, Any]:
+    """Compute differences between two text documents and return a git-like unified diff format"""
+    stream = stream_diff(text1, text2)
+    diff_text = "".join(stream)
+
+    return {
+        "diff_text": diff_text,
+        "similarity_score": stream.similarity_score
+    }
+
+def _count_lines(text: str) -> int:
+    """Count lines the way len(str.splitlines()) does, without building the list"""
+    if not text:
+        return 0
+    breaks = sum(1 for _ in _LINE_BREAK_RE.finditer(text))
+    return breaks + (0 if _LINE_BREAK_RE.match(text[-1]) else 1)
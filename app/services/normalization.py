@@ -0,0 +1,212 @@
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+import logging
+import math
+import re
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Page markers emitted by Document Intelligence (markdown output) and form feeds
+_PAGE_BREAK_RE = re.compile(r"\f|<!--\s*PageBreak\s*-->")
+_MARKER_RE = re.compile(
+    r"[ \t]*(?:\f|<!--\s*Page(?:Break|Header|Footer|Number)(?:=\"[^\"\n]*\")?\s*-->)[ \t]*\n?"
+)
+_LINE_RE = re.compile(r"[^\n]+\n?")
+_DIGITS_RE = re.compile(r"\d+")
+_PAGE_REF_RE = re.compile(r"\bpage\s+\d+(?:\s*(?:of|/)\s*\d+)?", re.IGNORECASE)
+_KEY_SPACE_RE = re.compile(r"\s+")
+_PAGE_NUMBER_RE = re.compile(
+    r"^\s*(?:page\s+)?[-\u2013\u2014]?\s*\d+\s*(?:(?:of|/)\s*\d+)?\s*[-\u2013\u2014]?\s*$",
+    re.IGNORECASE
+)
+
+# Single regex pass for whitespace and hyphenation cleanup; group order matters
+_CLEANUP_GROUPS = [
+    r"(?P<crlf>\r\n?)",
+    r"(?P<blank>\n(?:[ \t]*\n){2,})",
+    r"(?P<hyphen>(?<=\w)-[ \t]*\n[ \t]*(?=[a-z]))",
+    r"(?P<soft>\u00ad)",
+    r"(?P<trailing>[ \t]+(?=\n|\Z))",
+    r"(?P<space>[ \t]{2,}|\t)",
+]
+_CLEANUP_RE = re.compile("|".join(g for g in _CLEANUP_GROUPS if "<hyphen>" not in g))
+_CLEANUP_HYPHEN_RE = re.compile("|".join(_CLEANUP_GROUPS))
+_CLEANUP_REPLACEMENTS = {
+    "crlf": "\n",
+    "blank": "\n\n",
+    "hyphen": "",
+    "soft": "",
+    "trailing": "",
+    "space": " ",
+}
+
+# One-to-one character mapping, so offsets are unaffected
+_CHAR_TABLE = str.maketrans({
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'", "\u2032": "'",
+    "\u201c": '"', "\u201d": '"', "\u201e": '"', "\u201f": '"', "\u2033": '"',
+    "\u00ab": '"', "\u00bb": '"',
+    "\u2010": "-", "\u2011": "-", "\u2012": "-", "\u2013": "-", "\u2014": "-",
+    "\u2015": "-", "\u2212": "-",
+    "\u00a0": " ", "\u2007": " ", "\u2009": " ", "\u202f": " ", "\u3000": " ",
+})
+
+Edit = Tuple[int, int, str]
+
+@dataclass
+class NormalizedText:
+    """Normalized text with a map from each character back to the original text"""
+    text: str
+    offsets: array
+    original_length: int
+
+    @classmethod
+    def unchanged(cls, text: str) -> "NormalizedText":
+        """Wrap text that was not normalized, mapping each character to itself"""
+        return cls(text=text, offsets=array("q", range(len(text))), original_length=len(text))
+
+    def to_original(self, index: int) -> int:
+        """Map an offset in the normalized text to an offset in the original text"""
+        if index >= len(self.offsets):
+            return self.original_length
+        return self.offsets[index]
+
+    def original_span(self, start: int, end: int) -> Tuple[int, int]:
+        """Map a normalized [start, end) span to the matching original span"""
+        if end <= start:
+            position = self.to_original(start)
+            return position, position
+        return self.offsets[start], self.offsets[end - 1] + 1
+
+    def find_original(self, needle: str) -> Optional[Tuple[int, int]]:
+        """Find a string in the normalized text and return its original span"""
+        index = self.text.find(needle)
+        if index < 0:
+            return None
+        return self.original_span(index, index + len(needle))
+
+def normalize_text(text: str, page_offsets: Optional[List[int]] = None) -> NormalizedText:
+    """
+    Remove layout noise from extracted document text before diffing.
+
+    Strips page markers and repeated page headers/footers, rejoins hyphenated
+    line breaks (when NORMALIZE_JOIN_HYPHENATION is set) and unifies whitespace,
+    quotes and dashes. Pages are taken from
+    `page_offsets` (start offset of each page) when given, otherwise from page
+    break markers in the text.
+    """
+    original_length = len(text)
+    offsets = array("q", range(original_length))
+
+    removals = _find_page_furniture(text, page_offsets)
+    removals.extend((m.start(), m.end()) for m in _MARKER_RE.finditer(text))
+    text, offsets = _apply_edits(text, offsets, ((s, e, "") for s, e in _merge_spans(removals)))
+
+    text = text.translate(_CHAR_TABLE)
+    cleanup = _CLEANUP_HYPHEN_RE if settings.NORMALIZE_JOIN_HYPHENATION else _CLEANUP_RE
+    text, offsets = _apply_edits(text, offsets, (
+        (m.start(), m.end(), _CLEANUP_REPLACEMENTS[m.lastgroup])
+        for m in cleanup.finditer(text)
+    ))
+
+    start = len(text) - len(text.lstrip())
+    end = len(text.rstrip())
+    return NormalizedText(
+        text=text[start:end],
+        offsets=offsets[start:end],
+        original_length=original_length
+    )
+
+def _find_page_furniture(text: str, page_offsets: Optional[List[int]]) -> List[Tuple[int, int]]:
+    """
+    Find header, footer and page number lines at the edges of pages.
+
+    Only the outer NORMALIZE_FURNITURE_EDGE_LINES lines of each page, and at
+    most half of a short page from each side, are considered. Such a line is
+    furniture when it repeats on the same side of enough pages, or when it is
+    a bare page number that increases by one per page on enough pages.
+    """
+    pages = _page_spans(text, page_offsets)
+    if len(pages) < 2:
+        return []
+
+    edge_lines = settings.NORMALIZE_FURNITURE_EDGE_LINES
+    candidates = []
+    page_numbers = []
+    page_counts: Counter = Counter()
+    for page_index, (start, end) in enumerate(pages):
+        lines = [
+            m for m in _LINE_RE.finditer(text, start, end)
+            if m.group().strip() and not _MARKER_RE.fullmatch(m.group())
+        ]
+        # Short pages only contribute their outer lines, so body text is never a candidate
+        count = min(edge_lines, len(lines) // 2)
+        edges = [("top", m) for m in lines[:count]] + [("bottom", m) for m in lines[len(lines) - count:]]
+        keys = set()
+        for side, match in edges:
+            line = match.group()
+            key = (side, _KEY_SPACE_RE.sub(" ", _PAGE_REF_RE.sub("page #", line.strip().lower())))
+            candidates.append((match, key))
+            keys.add(key)
+            if _PAGE_NUMBER_RE.match(line):
+                page_numbers.append((match, page_index, int(_DIGITS_RE.search(line).group())))
+        page_counts.update(keys)
+
+    min_pages = max(2, math.ceil(settings.NORMALIZE_FURNITURE_MIN_RATIO * len(pages)))
+    removals = [
+        (match.start(), match.end())
+        for match, key in candidates
+        if page_counts[key] >= min_pages
+    ]
+
+    # Page numbers are consistent when number - page index is the same on most pages
+    numbered_pages = {(number - page_index, page_index) for _, page_index, number in page_numbers}
+    delta_counts = Counter(delta for delta, _ in numbered_pages)
+    if delta_counts:
+        delta, count = delta_counts.most_common(1)[0]
+        if count >= min_pages:
+            removals.extend(
+                (match.start(), match.end())
+                for match, page_index, number in page_numbers
+                if number - page_index == delta
+            )
+
+    logger.debug(f"Removing {len(removals)} page furniture lines across {len(pages)} pages")
+    return removals
+
+def _page_spans(text: str, page_offsets: Optional[List[int]]) -> List[Tuple[int, int]]:
+    """Split text into [start, end) page spans"""
+    if page_offsets:
+        starts = sorted(page_offsets)
+    else:
+        starts = [0] + [m.end() for m in _PAGE_BREAK_RE.finditer(text)]
+    ends = starts[1:] + [len(text)]
+    return [(s, e) for s, e in zip(starts, ends) if e > s]
+
+def _merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort spans and merge the overlapping ones"""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _apply_edits(text: str, offsets: array, edits: Iterable[Edit]) -> Tuple[str, array]:
+    """Apply sorted, non-overlapping (start, end, replacement) edits and carry offsets along"""
+    parts = []
+    new_offsets = array("q")
+    position = 0
+    for start, end, replacement in edits:
+        parts.append(text[position:start])
+        new_offsets.extend(offsets[position:start])
+        if replacement:
+            parts.append(replacement)
+            new_offsets.extend(array("q", [offsets[start]]) * len(replacement))
+        position = end
+    parts.append(text[position:])
+    new_offsets.extend(offsets[position:])
+    return "".join(parts), new_offsets
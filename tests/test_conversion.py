@@ -1,15 +1,86 @@
-from typing import Generator
+from typing import Dict, Generator, List, Optional
 import pytest
 from unittest.mock import Mock, patch
+from types import SimpleNamespace
 from fastapi import HTTPException
-from azure.core.exceptions import ServiceRequestError
+from azure.core.exceptions import HttpResponseError, ODataV4Format, ServiceRequestError
 from app.services.conversion import (
+    analyze_document,
+    clear_analysis_cache,
     convert_to_text,
     cleanup_temp_files,
     ConversionError
 )
+from app.core.config import settings
 from pathlib import Path
 import tempfile
+import threading
+import time
+
+def _http_error(status_code: int, message: str) -> HttpResponseError:
+    return HttpResponseError(message, response=Mock(status_code=status_code, reason=message))
+
+def _page_range_error(page_count: int) -> HttpResponseError:
+    """Error the service returns for a pages parameter beyond the last page"""
+    error = _http_error(400, "Invalid request.")
+    error.error = ODataV4Format({"error": {
+        "code": "InvalidRequest",
+        "message": "Invalid request.",
+        "innererror": {
+            "code": "InvalidParameter",
+            "message": f"The parameter pages is invalid: the document has {page_count} pages."
+        }
+    }})
+    return error
+
+class FakeDocumentIntelligenceClient:
+    """Local stand-in for DocumentIntelligenceClient serving fixed page texts"""
+
+    def __init__(
+        self,
+        pages: List[str],
+        delay: float = 0.0,
+        failures: int = 0,
+        errors: Optional[Dict[str, Exception]] = None,
+        reject_past_end: bool = True
+    ):
+        self.pages = pages
+        self.delay = delay
+        self.failures = failures
+        self.errors = errors or {}
+        self.reject_past_end = reject_past_end
+        self.calls: List[Optional[str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def begin_analyze_document(self, model_id, body, pages: Optional[str] = None):
+        with self._lock:
+            self.calls.append(pages)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failures > 0
+            self.failures -= 1
+        try:
+            time.sleep(self.delay)
+            if fail:
+                raise HttpResponseError("Service unavailable", response=Mock(status_code=503, reason="Unavailable"))
+            if pages in self.errors:
+                raise self.errors[pages]
+            first, last = (int(p) for p in pages.split("-")) if pages else (1, len(self.pages))
+            if first > len(self.pages) and self.reject_past_end:
+                # The service rejects ranges that start after the last page
+                raise _page_range_error(len(self.pages))
+            selected = self.pages[first - 1:last]
+            result = SimpleNamespace(content="\n".join(selected), pages=[])
+            offset = 0
+            for text in selected:
+                result.pages.append(SimpleNamespace(spans=[SimpleNamespace(offset=offset, length=len(text))]))
+                offset += len(text) + 1
+            return Mock(result=Mock(return_value=result))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
 
 @pytest.fixture
 def sample_docx() -> Generator[str, None, None]:
@@ -24,6 +95,7 @@ def mock_document_intelligence_client() -> Mock:
     """Mock Azure Document Intelligence client"""
     mock_result = Mock()
     mock_result.content = "Test content line 1\nTest content line 2"
+    mock_result.pages = []
     
     mock_poller = Mock()
     mock_poller.result.return_value = mock_result
@@ -104,6 +176,7 @@ def test_convert_with_different_contents(
     with patch('app.services.conversion.DocumentIntelligenceClient') as mock_client_class:
         mock_result = Mock()
         mock_result.content = expected_contains
+        mock_result.pages = []
         mock_poller = Mock()
         mock_poller.result.return_value = mock_result
         mock_client = Mock()
@@ -122,4 +195,148 @@ def test_cleanup_temp_files_with_errors(tmp_path: Path) -> None:
         mock_remove.side_effect = OSError("Permission denied")
         
         # Should not raise exception
-        cleanup_temp_files()
\ No newline at end of file
+        cleanup_temp_files()
+
+@pytest.fixture
+def credentials() -> Generator[None, None, None]:
+    """Configure dummy Document Intelligence credentials for the fake client"""
+    with patch.object(settings, "AZURE_DOC_INTELLIGENCE_ENDPOINT", "https://fake.cognitiveservices.azure.com"), \
+         patch.object(settings, "AZURE_DOC_INTELLIGENCE_KEY", "fake-key"):
+        yield
+
+@pytest.fixture
+def page_ranges(credentials: None) -> Generator[None, None, None]:
+    """Enable page range analysis with small ranges and no retry delay"""
+    clear_analysis_cache()
+    with patch.object(settings, "DOC_INTELLIGENCE_PAGE_RANGE_SIZE", 2), \
+         patch.object(settings, "DOC_INTELLIGENCE_MAX_CONCURRENCY", 3), \
+         patch.object(settings, "DOC_INTELLIGENCE_RETRY_WAIT", 0):
+        yield
+    clear_analysis_cache()
+
+def test_analyze_document_page_offsets(sample_docx: str, credentials: None) -> None:
+    """Test that single-call analysis keeps page offsets"""
+    fake = FakeDocumentIntelligenceClient(["Page one", "Page two"])
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        result = analyze_document(sample_docx)
+
+    assert result.content == "Page one\nPage two"
+    assert result.page_offsets == [0, 9]
+    assert fake.calls == [None]
+
+def test_analyze_document_page_ranges(sample_docx: str, page_ranges: None) -> None:
+    """Test that page ranges are analyzed concurrently and stitched in order"""
+    pages = [f"Page {i}" for i in range(1, 10)]
+    fake = FakeDocumentIntelligenceClient(pages, delay=0.05)
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        result = analyze_document(sample_docx)
+
+    assert result.content == "\n".join(pages)
+    assert [result.content[offset:].split("\n")[0] for offset in result.page_offsets] == pages
+    assert sorted(fake.calls) == ["1-2", "11-12", "3-4", "5-6", "7-8", "9-10"]
+    assert fake.max_in_flight == 3
+
+def test_analyze_document_page_range_retries(sample_docx: str, page_ranges: None) -> None:
+    """Test that failed page ranges are retried"""
+    fake = FakeDocumentIntelligenceClient(["Page 1", "Page 2", "Page 3"], failures=2)
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        result = analyze_document(sample_docx)
+
+    assert result.content == "Page 1\nPage 2\nPage 3"
+    assert len(fake.calls) == 5
+
+def test_analyze_document_page_range_cache(sample_docx: str, page_ranges: None) -> None:
+    """Test that analyzed page ranges are served from the cache"""
+    fake = FakeDocumentIntelligenceClient(["Page 1", "Page 2", "Page 3"])
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        first = analyze_document(sample_docx)
+        calls = len(fake.calls)
+        second = analyze_document(sample_docx)
+
+    assert first == second
+    assert len(fake.calls) == calls
+
+def test_analyze_document_page_range_error(sample_docx: str, page_ranges: None) -> None:
+    """Test that a failed range in the middle of the document is not treated as its end"""
+    pages = [f"Page {i}" for i in range(1, 10)]
+    fake = FakeDocumentIntelligenceClient(pages, errors={"3-4": _http_error(400, "Bad request")})
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        with pytest.raises(HTTPException) as exc_info:
+            analyze_document(sample_docx)
+        assert "Bad request" in str(exc_info.value.detail)
+
+        # The failure is not cached, so a later request sees the whole document
+        fake.errors.clear()
+        result = analyze_document(sample_docx)
+    assert result.content == "\n".join(pages)
+
+def test_analyze_document_rejected_range_before_end(sample_docx: str, page_ranges: None) -> None:
+    """Test that pages returned after a range rejected as out of range raise an error"""
+    pages = [f"Page {i}" for i in range(1, 10)]
+    fake = FakeDocumentIntelligenceClient(
+        pages,
+        errors={"3-4": _page_range_error(2)}
+    )
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        with pytest.raises(HTTPException) as exc_info:
+            analyze_document(sample_docx)
+    assert "page 5 exists" in str(exc_info.value.detail)
+
+def test_analyze_document_page_range_not_retried(sample_docx: str, page_ranges: None) -> None:
+    """Test that programming errors are not retried"""
+    fake = FakeDocumentIntelligenceClient(["Page 1"], errors={"1-2": TypeError("bad argument")})
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        with pytest.raises(HTTPException):
+            analyze_document(sample_docx)
+    assert fake.calls.count("1-2") == 1
+
+def test_analyze_document_rejected_last_range_in_wave(sample_docx: str, page_ranges: None) -> None:
+    """Test that a rejection at the end of a wave is checked against the next page"""
+    pages = [f"Page {i}" for i in range(1, 10)]
+    fake = FakeDocumentIntelligenceClient(pages, errors={"5-6": _page_range_error(4)})
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        with pytest.raises(HTTPException) as exc_info:
+            analyze_document(sample_docx)
+    assert "page 7 exists" in str(exc_info.value.detail)
+
+def test_analyze_document_ends_on_exact_range_boundary(sample_docx: str, page_ranges: None) -> None:
+    """Test that a document ending exactly at a range boundary is stitched completely"""
+    pages = [f"Page {i}" for i in range(1, 5)]
+    fake = FakeDocumentIntelligenceClient(pages)
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        result = analyze_document(sample_docx)
+    assert result.content == "\n".join(pages)
+    assert "7-7" in fake.calls
+
+def test_analyze_document_other_page_error_not_end(sample_docx: str, page_ranges: None) -> None:
+    """Test that a 400 merely mentioning pages does not end the document"""
+    pages = [f"Page {i}" for i in range(1, 10)]
+    fake = FakeDocumentIntelligenceClient(
+        pages,
+        errors={"5-6": _http_error(400, "The page count exceeds the limit")}
+    )
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        with pytest.raises(HTTPException) as exc_info:
+            analyze_document(sample_docx)
+    assert "page count exceeds" in str(exc_info.value.detail)
+
+def test_analyze_document_empty_range_past_end(sample_docx: str, page_ranges: None) -> None:
+    """Test that empty results past the end do not add content"""
+    pages = [f"Page {i}" for i in range(1, 7)]
+    fake = FakeDocumentIntelligenceClient(pages, reject_past_end=False)
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        result = analyze_document(sample_docx)
+    assert result.content == "\n".join(pages)
+    assert len(result.page_offsets) == 6
+
+def test_analyze_document_pages_after_confirmed_end(sample_docx: str, page_ranges: None) -> None:
+    """Test that pages returned later in the wave than a confirmed end raise an error"""
+    pages = [f"Page {i}" for i in range(1, 10)]
+    fake = FakeDocumentIntelligenceClient(
+        pages,
+        errors={"3-4": _page_range_error(2), "5-5": _page_range_error(2)}
+    )
+    with patch('app.services.conversion.DocumentIntelligenceClient', return_value=fake):
+        with pytest.raises(HTTPException) as exc_info:
+            analyze_document(sample_docx)
+    assert "after the end of the document" in str(exc_info.value.detail)
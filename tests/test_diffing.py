@@ -1,5 +1,5 @@
 import pytest
-from app.services.diffing import compute_diff
+from app.services.diffing import compute_diff, stream_diff
 
 def test_basic_difference_computation():
     """Test basic text difference computation"""
@@ -50,5 +50,48 @@ def test_error_handling():
     with pytest.raises(Exception):
         compute_diff("valid", None)
 
+def test_stream_diff_yields_bounded_hunks():
+    """Test that the streamed diff is emitted in hunks of limited size"""
+    text1 = "\n".join(f"Line {i}" for i in range(100))
+    text2 = "\n".join(f"Line {i}" if i % 10 else f"Changed {i}" for i in range(100))
+    
+    stream = stream_diff(text1, text2, hunk_lines=7)
+    chunks = list(stream)
+    
+    assert chunks[0].startswith("--- source\n+++ target\n@@ -1,100 +1,100 @@")
+    assert len(chunks) > 2
+    assert all(chunk.count("\n") <= 7 for chunk in chunks[1:])
+    assert "+Changed" in "".join(chunks)
+
+def test_stream_diff_matches_compute_diff():
+    """Test that streaming produces the same diff and similarity as compute_diff"""
+    text1 = "The cat sat on the mat.\nSecond line\nThird line"
+    text2 = "The dog sat on the mat.\nSecond line\nFourth line"
+    
+    result = compute_diff(text1, text2)
+    stream = stream_diff(text1, text2, hunk_lines=1)
+    diff_text = "".join(stream)
+    
+    # Ignore the timestamp on the hunk header line
+    assert diff_text.splitlines()[3:] == result["diff_text"].splitlines()[3:]
+    assert stream.similarity_score == result["similarity_score"]
+
+def test_stream_similarity_unavailable_until_exhausted():
+    """Test that the similarity score is only reported once the stream is consumed"""
+    stream = stream_diff("a\nb", "a\nc")
+    assert stream.similarity_score is None
+    "".join(stream)
+    assert stream.similarity_score < 1.0
+
+@pytest.mark.parametrize("text1,text2,header", [
+    ("a\nb", "a\nc", "@@ -1,2 +1,2 @@"),
+    ("a\rb", "a\rc", "@@ -1,2 +1,2 @@"),
+    ("a\fb\u2028c\n", "a", "@@ -1,3 +1,1 @@"),
+])
+def test_diff_header_line_counts(text1, text2, header):
+    """Test that header line counts match str.splitlines"""
+    result = compute_diff(text1, text2)
+    assert result["diff_text"].splitlines()[2].startswith(header)
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
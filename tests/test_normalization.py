@@ -0,0 +1,107 @@
+import pytest
+from unittest.mock import patch
+from app.core.config import settings
+from app.services.diffing import compute_diff
+from app.services.normalization import NormalizedText, normalize_text
+
+def _paged(*pages: str) -> str:
+    return "\n<!-- PageBreak -->\n".join(pages)
+
+def test_repeated_headers_and_footers_removed():
+    """Test that lines repeated at the edges of most pages are stripped"""
+    text = _paged(*[
+        f"Contoso Master Agreement\nClause {i} body text.\nConfidential - Page {i} of 3\n{i}"
+        for i in range(1, 4)
+    ])
+    result = normalize_text(text)
+
+    assert "Contoso Master Agreement" not in result.text
+    assert "Confidential" not in result.text
+    assert "Page" not in result.text
+    assert "PageBreak" not in result.text
+    for i in range(1, 4):
+        assert f"Clause {i} body text." in result.text
+
+def test_single_page_keeps_edge_lines():
+    """Test that furniture detection needs more than one page"""
+    text = "Contoso Master Agreement\nClause 1 body text."
+    result = normalize_text(text)
+    assert result.text == text
+
+def test_page_offsets_define_pages():
+    """Test furniture detection with explicit page offsets"""
+    pages = [
+        "Header\nFirst clause.\nSecond clause.\nThird clause.\nFooter\n",
+        "Header\nFourth clause.\nFifth clause.\nSixth clause.\nFooter\n"
+    ]
+    result = normalize_text("".join(pages), page_offsets=[0, len(pages[0])])
+    assert result.text == (
+        "First clause.\nSecond clause.\nThird clause.\n"
+        "Fourth clause.\nFifth clause.\nSixth clause."
+    )
+
+def test_repeated_body_lines_on_short_pages_kept():
+    """Test that a clause repeated on every short page is not mistaken for furniture"""
+    clause = "The Supplier may terminate at will."
+    source = normalize_text(_paged(f"Intro A\n{clause}\nEnd A", f"Intro B\n{clause}\nEnd B"))
+    target = normalize_text(_paged("Intro A\nEnd A", "Intro B\nEnd B"))
+
+    assert source.text.count(clause) == 2
+    assert f"-{clause}" in compute_diff(source.text, target.text)["diff_text"]
+
+@pytest.mark.parametrize("text,expected", [
+    ("“Quoted” and ‘single’", "\"Quoted\" and 'single'"),
+    ("2019–2023 — term", "2019-2023 - term"),
+    ("too   many\t spaces  \nline", "too many spaces\nline"),
+    ("para one\n\n\n\n para two", "para one\n\n para two"),
+    ("self-\nemployed and co­operation", "self-\nemployed and cooperation"),
+    ("windows\r\nline", "windows\nline"),
+])
+def test_character_and_whitespace_cleanup(text: str, expected: str):
+    """Test quote, dash, whitespace and hyphenation cleanup"""
+    assert normalize_text(text).text == expected
+
+def test_join_hyphenation_setting():
+    """Test that hyphenated line breaks are only joined when enabled"""
+    with patch.object(settings, "NORMALIZE_JOIN_HYPHENATION", True):
+        assert normalize_text("agree-\nment").text == "agreement"
+
+def test_numbers_at_page_edges_kept():
+    """Test that real numbers at page edges are not mistaken for page numbers"""
+    text = _paged(
+        "Clause one.\nAmount due:\n2500",
+        "Clause two.\nYears:\n3",
+        "Clause three.\nNotice days:\n30"
+    )
+    result = normalize_text(text)
+    for number in ("2500", "3", "30"):
+        assert f":\n{number}" in result.text
+
+def test_offsets_point_to_original_text():
+    """Test that normalized spans map back to the original text"""
+    text = _paged(
+        "Header\n  The “Supplier”   shall deliver.\nFooter",
+        "Header\nPayment is due in thirty   days.\nFooter"
+    )
+    result = normalize_text(text)
+    assert len(result.offsets) == len(result.text)
+
+    start, end = result.find_original('"Supplier" shall deliver')
+    assert text[start:end] == "“Supplier”   shall deliver"
+
+    start, end = result.find_original("thirty days")
+    assert text[start:end] == "thirty   days"
+
+    assert result.find_original("missing") is None
+    assert result.to_original(len(result.text)) == len(text)
+
+def test_unchanged_text_maps_to_itself():
+    """Test the identity offset map for text that was not normalized"""
+    result = NormalizedText.unchanged("Some  text")
+    assert result.find_original("text") == (6, 10)
+
+def test_empty_text():
+    """Test normalization of empty text"""
+    result = normalize_text("")
+    assert result.text == ""
+    assert len(result.offsets) == 0